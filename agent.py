@@ -4,17 +4,77 @@ AI agent that recommends weekend outdoor activities based on location and weathe
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+import json
 import os
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional
+from datetime import date
+from typing import AsyncIterator, Iterator, Optional
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI
 
-from weather import Location, DayForecast, weather_summary, geocode, get_forecast
+from weather import (
+    Location,
+    DayForecast,
+    weather_summary,
+    geocode,
+    get_forecast,
+    get_forecast_batch,
+    ageocode,
+    aget_forecast,
+    aget_forecast_batch,
+    aio_session,
+)
 
+# Upper bounds per async_session() block (per process for a process-wide block, as the
+# API server opens) on in-flight async recommendations, and on concurrent OpenAI calls
+# within them (keeps bursts under the account's rate limits).
+MAX_CONCURRENT_RECOMMENDATIONS = 200
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "50"))
 
-@dataclass
+# Weekday memo for forecast dates (grows by roughly one entry per day).
+_WEEKDAYS: dict[str, int] = {}
+
+# The prompt is split so the static instructions always come first and are
+# byte-identical across calls, letting OpenAI's prompt caching reuse that prefix;
+# only the user message varies per request.
+SYSTEM_INSTRUCTIONS = """You are a friendly weekend outdoor activity advisor. Given the location and local weather forecast for the weekend, suggest 3–5 specific outdoor activities that fit the conditions. Be concise and practical.
+
+Consider:
+- If it's dry and mild/warm: suggest hiking, biking, parks, beaches, outdoor dining, etc.
+- If it's rainy or cold: suggest activities that are still possible (e.g. short walks, covered markets, indoor-outdoor options) or briefly note when to stay in.
+- Tailor suggestions to the region (e.g. local parks, trails, or landmarks).
+- Mention what to wear or bring (e.g. layers, umbrella) when relevant.
+
+Respond in 1–2 short paragraphs. No bullet list unless you prefer it."""
+
+_USER_CONTEXT_TEMPLATE = """Location: {place}
+Timezone: {timezone}
+
+Weekend weather forecast:
+{summary}"""
+
+# Routes repeated requests to the same prompt cache; bump when SYSTEM_INSTRUCTIONS change.
+PROMPT_CACHE_KEY = "weekend-advisor-v1"
+
+# Request coalescing for arecommend_batched(): prompts arriving within BATCH_WAIT_MS
+# share one completion call (up to BATCH_MAX prompts per call).
+BATCH_MAX = 8
+BATCH_WAIT_MS = 50
+_BATCH_INSTRUCTIONS = (
+    "You will receive a JSON array of independent weekend-planning requests (each a location "
+    "and its weekend forecast). Answer each one "
+    "exactly as if it had been sent on its own. Return a JSON object of the form "
+    '{"recommendations": ["...", "..."]} with one string per request, in the same order.'
+)
+
+
+@dataclass(slots=True, frozen=True)
 class RecommendationInput:
     """Input for the recommendation agent."""
 
@@ -23,29 +83,156 @@ class RecommendationInput:
     weekend_days: list[DayForecast]  # subset of forecast (e.g. Sat + Sun)
 
 
-def _get_client() -> OpenAI:
+def _api_key() -> str:
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise ValueError(
             "OPENAI_API_KEY is not set. Create an API key at https://platform.openai.com/api-keys "
             "and set it in your environment or .env file."
         )
-    return OpenAI(api_key=api_key)
+    return api_key
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_client(api_key: str, base_url: Optional[str]) -> OpenAI:
+    """
+    One OpenAI client per (key, base URL), so every recommend() call shares the same
+    HTTP/2 connection pool instead of building a new client per request.
+    """
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=25),
+        http2=True,
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+
+
+def _get_client() -> OpenAI:
+    return _cached_client(_api_key(), os.environ.get("OPENAI_BASE_URL") or None)
+
+
+def _get_async_client() -> AsyncOpenAI:
+    return AsyncOpenAI(api_key=_api_key())
+
+
+class _AsyncScope:
+    """
+    State shared by the async calls inside one async_session() block. The AsyncOpenAI
+    client is created on first use, so blocks that never reach the model need no key.
+    """
+
+    def __init__(self) -> None:
+        self._client: Optional[AsyncOpenAI] = None
+        self._batch: Optional[_PendingBatch] = None
+        self.recommend_limit = asyncio.Semaphore(MAX_CONCURRENT_RECOMMENDATIONS)
+        self.openai_limit = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = _get_async_client()
+        return self._client
+
+    def batch(self) -> _PendingBatch:
+        if self._batch is None:
+            self._batch = _PendingBatch()
+        return self._batch
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+
+
+# Tracked in a context variable so tasks started inside the block see the same scope;
+# a process-wide block (see async_session) is the fallback where none is active.
+_ASYNC_SCOPE: ContextVar[Optional[_AsyncScope]] = ContextVar("agent_async_scope", default=None)
+_DEFAULT_SCOPE: Optional[_AsyncScope] = None
+
+
+def _current_scope() -> Optional[_AsyncScope]:
+    return _ASYNC_SCOPE.get() or _DEFAULT_SCOPE
+
+
+@contextlib.asynccontextmanager
+async def _scope(process_wide: bool = False) -> AsyncIterator[_AsyncScope]:
+    global _DEFAULT_SCOPE
+    scope = _current_scope()
+    if scope is not None:
+        yield scope
+        return
+
+    scope = _AsyncScope()
+    token = None
+    if process_wide:
+        _DEFAULT_SCOPE = scope
+    else:
+        token = _ASYNC_SCOPE.set(scope)
+    try:
+        yield scope
+    finally:
+        if token is None:
+            _DEFAULT_SCOPE = None
+        else:
+            _ASYNC_SCOPE.reset(token)
+        await scope.aclose()
+
+
+@contextlib.asynccontextmanager
+async def async_session(process_wide: bool = False) -> AsyncIterator[None]:
+    """
+    Share one AsyncOpenAI client, one Open-Meteo session (see `weather.aio_session`)
+    and the concurrency limits across the async calls awaited in this block, and
+    close the clients on exit. Nested blocks reuse the outer one; async calls made
+    outside any block open (and close) their own.
+
+    With `process_wide=True` the block also serves async calls from every other task
+    on the event loop, e.g. opened once in a server's startup hook so the limits
+    bound all requests the process handles.
+    """
+    async with _scope(process_wide), aio_session(process_wide):
+        yield
+
+
+def _weekday(iso_date: str) -> int:
+    """
+    Weekday (Monday=0) of a YYYY-MM-DD date. Open-Meteo dates have a fixed layout, so
+    slice the fields instead of going through strptime; results are memoized since
+    concurrent forecasts share the same handful of dates.
+    """
+    wd = _WEEKDAYS.get(iso_date)
+    if wd is None:
+        wd = _WEEKDAYS[iso_date] = date(int(iso_date[0:4]), int(iso_date[5:7]), int(iso_date[8:10])).weekday()
+    return wd
 
 
 def _weekend_forecast(forecast: list[DayForecast]) -> list[DayForecast]:
     """
     Return the weekend days from the forecast (Saturday and Sunday).
     Assumes forecast starts from today; we take the first Sat and Sun we find.
+    Forecast days are consecutive, so only the first date needs parsing.
     """
-    weekend = []
-    for d in forecast:
-        # ISO date: weekday 5=Saturday, 6=Sunday (Python: Monday=0)
-        dt = datetime.strptime(d.date, "%Y-%m-%d")
-        if dt.weekday() in (5, 6):
-            weekend.append(d)
+    if not forecast:
+        return []
+    # ISO date: weekday 5=Saturday, 6=Sunday (Python: Monday=0)
+    wd0 = _weekday(forecast[0].date)
+    indices = sorted(i for i in ((5 - wd0) % 7, (6 - wd0) % 7) if i < len(forecast))
     # If we have at least 7 days we should get both; otherwise return up to 2 weekend days
-    return weekend[:2] if weekend else forecast[:2]
+    return [forecast[i] for i in indices] or forecast[:2]
+
+
+def _user_context(input_data: RecommendationInput) -> str:
+    location = input_data.location
+    place = ", ".join(filter(None, [location.name, location.admin1, location.country]))
+    return _USER_CONTEXT_TEMPLATE.format_map({
+        "place": place,
+        "timezone": location.timezone,
+        "summary": weather_summary(input_data.weekend_days),
+    })
+
+
+def _build_messages(input_data: RecommendationInput) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_INSTRUCTIONS},
+        {"role": "user", "content": _user_context(input_data)},
+    ]
 
 
 def recommend(input_data: RecommendationInput, model: Optional[str] = None) -> str:
@@ -56,46 +243,205 @@ def recommend(input_data: RecommendationInput, model: Optional[str] = None) -> s
     model = model or os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
     client = _get_client()
 
-    location = input_data.location
-    weekend = input_data.weekend_days
-    summary = weather_summary(weekend)
-
-    place = f"{location.name}, {location.admin1 or ''}, {location.country}".strip(", ")
-    prompt = f"""You are a friendly weekend outdoor activity advisor. Given the location and local weather forecast for the weekend, suggest 3–5 specific outdoor activities that fit the conditions. Be concise and practical.
-
-Location: {place}
-Timezone: {location.timezone}
-
-Weekend weather forecast:
-{summary}
+    response = client.chat.completions.create(
+        model=model,
+        messages=_build_messages(input_data),
+        max_tokens=500,
+        extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
+    )
+    return response.choices[0].message.content or ""
 
-Consider:
-- If it's dry and mild/warm: suggest hiking, biking, parks, beaches, outdoor dining, etc.
-- If it's rainy or cold: suggest activities that are still possible (e.g. short walks, covered markets, indoor-outdoor options) or briefly note when to stay in.
-- Tailor suggestions to the region (e.g. local parks, trails, or landmarks).
-- Mention what to wear or bring (e.g. layers, umbrella) when relevant.
 
-Respond in 1–2 short paragraphs. No bullet list unless you prefer it."""
+def recommend_stream(input_data: RecommendationInput, model: Optional[str] = None) -> Iterator[str]:
+    """
+    Streaming variant of `recommend`: yields the recommendation text piece by piece
+    as the model generates it. The request is sent before this returns, so
+    configuration and API errors surface immediately rather than mid-iteration.
+    """
+    model = model or os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    client = _get_client()
 
-    response = client.chat.completions.create(
+    stream = client.chat.completions.create(
         model=model,
-        messages=[{"role": "user", "content": prompt}],
+        messages=_build_messages(input_data),
         max_tokens=500,
+        stream=True,
+        extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
     )
+    return _iter_stream_content(stream)
+
+
+def _iter_stream_content(stream) -> Iterator[str]:
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def arecommend(input_data: RecommendationInput, model: Optional[str] = None) -> str:
+    """Async variant of `recommend` using the AsyncOpenAI client."""
+    model = model or os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+
+    async with _scope() as scope, scope.openai_limit:
+        response = await scope.client().chat.completions.create(
+            model=model,
+            messages=_build_messages(input_data),
+            max_tokens=500,
+            extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
+        )
     return response.choices[0].message.content or ""
 
 
-def get_weekend_recommendation(
-    location_query: str,
-    model: Optional[str] = None,
-) -> str:
+async def arecommend_stream(input_data: RecommendationInput, model: Optional[str] = None) -> AsyncIterator[str]:
     """
-    One-shot: geocode location, fetch forecast, pick weekend days, and return
-    AI-generated weekend activity recommendations.
+    Async variant of `recommend_stream`. The request is sent before this returns; the
+    returned iterator holds one OPENAI_MAX_CONCURRENCY slot (and, outside any
+    async_session() block, a client of its own) until it is exhausted or closed.
+    """
+    model = model or os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    # Not entered as a block: the stream outlives this call, so it releases the scope itself.
+    scope = _current_scope()
+    owned = scope is None
+    if owned:
+        scope = _AsyncScope()
+
+    await scope.openai_limit.acquire()
+    try:
+        stream = await scope.client().chat.completions.create(
+            model=model,
+            messages=_build_messages(input_data),
+            max_tokens=500,
+            stream=True,
+            extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
+        )
+    except BaseException:
+        scope.openai_limit.release()
+        if owned:
+            await scope.aclose()
+        raise
+    return _aiter_stream_content(stream, scope, owned)
+
+
+async def _aiter_stream_content(stream, scope: _AsyncScope, owned: bool) -> AsyncIterator[str]:
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        scope.openai_limit.release()
+        await stream.close()
+        if owned:
+            await scope.aclose()
+
+
+class _PendingBatch:
+    """
+    Collects concurrent arecommend_batched() calls in one async_session() block and
+    sends them to the model as a single combined completion, then hands each caller
+    its answer.
+    """
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+
+    async def submit(self, input_data: RecommendationInput, model: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((input_data, model, future))
+        if self._queue.qsize() >= BATCH_MAX:
+            self._full.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._flush_loop())
+        return await future
+
+    async def _flush_loop(self) -> None:
+        try:
+            while not self._queue.empty():
+                try:
+                    await asyncio.wait_for(self._full.wait(), BATCH_WAIT_MS / 1000)
+                except asyncio.TimeoutError:
+                    pass
+                self._full.clear()
+
+                by_model: dict[str, list] = {}
+                for _ in range(min(BATCH_MAX, self._queue.qsize())):
+                    item = self._queue.get_nowait()
+                    by_model.setdefault(item[1], []).append(item)
+                if self._queue.qsize() >= BATCH_MAX:
+                    self._full.set()
+
+                for model, items in by_model.items():
+                    task = asyncio.ensure_future(self._send(model, items))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._inflight.discard)
+        finally:
+            # Drop the finished task so the batcher holds no reference to its loop.
+            self._task = None
+
+    async def _send(self, model: str, items: list) -> None:
+        try:
+            if len(items) == 1:
+                results = [await arecommend(items[0][0], model=model)]
+            else:
+                results = await _arecommend_many([item[0] for item in items], model)
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def _arecommend_many(inputs: list[RecommendationInput], model: str) -> list[str]:
+    """
+    Answer several prompts with one completion call. Falls back to one call per prompt
+    if the model does not return one recommendation per request.
     """
+    async with _scope() as scope, scope.openai_limit:
+        response = await scope.client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_INSTRUCTIONS + "\n\n" + _BATCH_INSTRUCTIONS},
+                {"role": "user", "content": json.dumps([_user_context(i) for i in inputs], ensure_ascii=False)},
+            ],
+            max_tokens=500 * len(inputs),
+            response_format={"type": "json_object"},
+            extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
+        )
+    try:
+        results = json.loads(response.choices[0].message.content or "")["recommendations"]
+    except (ValueError, KeyError, TypeError):
+        results = None
+    if not isinstance(results, list) or len(results) != len(inputs):
+        return list(await asyncio.gather(*(arecommend(i, model=model) for i in inputs)))
+    return [r if isinstance(r, str) else json.dumps(r, ensure_ascii=False) for r in results]
+
+
+async def arecommend_batched(input_data: RecommendationInput, model: Optional[str] = None) -> str:
+    """
+    Like `arecommend`, but requests in the same async_session() block arriving within
+    BATCH_WAIT_MS of each other share a single completion round-trip (up to BATCH_MAX
+    per call). Outside any block there is nothing to batch with, so this is `arecommend`.
+    """
+    scope = _current_scope()
+    if scope is None:
+        return await arecommend(input_data, model=model)
+    model = model or os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    return await scope.batch().submit(input_data, model)
+
+
+def _not_found_message(location_query: str) -> str:
+    return f"Could not find a location for: {location_query!r}. Try a city name or postal code."
+
+
+def _prepare_input(location_query: str) -> Optional[RecommendationInput]:
+    """Geocode the location and fetch its forecast; None if the location is unknown."""
     locations = geocode(location_query)
     if not locations:
-        return f"Could not find a location for: {location_query!r}. Try a city name or postal code."
+        return None
 
     loc = locations[0]
     forecast = get_forecast(loc.latitude, loc.longitude, loc.timezone, days=7)
@@ -104,5 +450,147 @@ def get_weekend_recommendation(
     if not weekend:
         weekend = forecast[:2]
 
-    input_data = RecommendationInput(location=loc, forecast=forecast, weekend_days=weekend)
+    return RecommendationInput(location=loc, forecast=forecast, weekend_days=weekend)
+
+
+def get_weekend_recommendation(
+    location_query: str,
+    model: Optional[str] = None,
+) -> str:
+    """
+    One-shot: geocode location, fetch forecast, pick weekend days, and return
+    AI-generated weekend activity recommendations.
+    """
+    input_data = _prepare_input(location_query)
+    if input_data is None:
+        return _not_found_message(location_query)
     return recommend(input_data, model=model)
+
+
+def get_weekend_recommendation_stream(
+    location_query: str,
+    model: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Like `get_weekend_recommendation`, but yields the recommendation text as it is
+    generated. Geocoding, forecast and the LLM request happen before this returns.
+    """
+    input_data = _prepare_input(location_query)
+    if input_data is None:
+        return iter([_not_found_message(location_query)])
+    return recommend_stream(input_data, model=model)
+
+
+def get_weekend_recommendations(
+    location_queries: list[str],
+    model: Optional[str] = None,
+) -> list[str]:
+    """
+    Batch form of `get_weekend_recommendation`: one recommendation per query, in order.
+    Forecasts for all found locations come from a single Open-Meteo request, and the
+    geocoding and LLM calls run concurrently on a small thread pool.
+    """
+    if not location_queries:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(8, len(location_queries))) as pool:
+        found = [locs[0] if locs else None for locs in pool.map(geocode, location_queries)]
+        located = [loc for loc in found if loc is not None]
+        forecasts = iter(get_forecast_batch([(loc.latitude, loc.longitude, loc.timezone) for loc in located]))
+
+        inputs: list[Optional[RecommendationInput]] = []
+        for loc in found:
+            if loc is None:
+                inputs.append(None)
+                continue
+            forecast = next(forecasts)
+            weekend = _weekend_forecast(forecast) or forecast[:2]
+            inputs.append(RecommendationInput(location=loc, forecast=forecast, weekend_days=weekend))
+
+        pending = {i: pool.submit(recommend, inp, model=model) for i, inp in enumerate(inputs) if inp is not None}
+        return [
+            pending[i].result() if i in pending else _not_found_message(query)
+            for i, query in enumerate(location_queries)
+        ]
+
+
+async def _aprepare_input(location_query: str) -> Optional[RecommendationInput]:
+    """Async variant of `_prepare_input`."""
+    async with aio_session():
+        locations = await ageocode(location_query)
+        if not locations:
+            return None
+
+        loc = locations[0]
+        forecast = await aget_forecast(loc.latitude, loc.longitude, loc.timezone, days=7)
+    weekend = _weekend_forecast(forecast) or forecast[:2]
+    return RecommendationInput(location=loc, forecast=forecast, weekend_days=weekend)
+
+
+async def _aiter_once(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def aget_weekend_recommendation(
+    location_query: str,
+    model: Optional[str] = None,
+) -> str:
+    """
+    Async variant of `get_weekend_recommendation`. Geocoding, forecast and LLM calls
+    are non-blocking, so one event loop can serve many requests concurrently. Run
+    them inside `async_session()` so they share clients and the
+    MAX_CONCURRENT_RECOMMENDATIONS cap, and so concurrent prompts are batched (see
+    `arecommend_batched`); a call outside any block skips the batching wait.
+    """
+    batched = _current_scope() is not None
+    async with _scope() as scope, scope.recommend_limit:
+        input_data = await _aprepare_input(location_query)
+        if input_data is None:
+            return _not_found_message(location_query)
+        if batched:
+            return await arecommend_batched(input_data, model=model)
+        return await arecommend(input_data, model=model)
+
+
+async def aget_weekend_recommendation_stream(
+    location_query: str,
+    model: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Async variant of `get_weekend_recommendation_stream` (see `arecommend_stream`).
+    Geocoding, forecast and the LLM request happen before this returns.
+    """
+    input_data = await _aprepare_input(location_query)
+    if input_data is None:
+        return _aiter_once(_not_found_message(location_query))
+    return await arecommend_stream(input_data, model=model)
+
+
+async def aget_weekend_recommendations(
+    location_queries: list[str],
+    model: Optional[str] = None,
+) -> list[str]:
+    """
+    Async variant of `get_weekend_recommendations`. Geocoding runs concurrently,
+    forecasts come from a single Open-Meteo request and the prompts go through
+    `arecommend_batched`, so small batches share one completion call.
+    """
+    if not location_queries:
+        return []
+
+    async with async_session():
+        found = [locs[0] if locs else None for locs in await asyncio.gather(*map(ageocode, location_queries))]
+        located = [loc for loc in found if loc is not None]
+        forecasts = iter(await aget_forecast_batch([(loc.latitude, loc.longitude, loc.timezone) for loc in located]))
+
+        inputs: dict[int, RecommendationInput] = {}
+        for i, loc in enumerate(found):
+            if loc is None:
+                continue
+            forecast = next(forecasts)
+            weekend = _weekend_forecast(forecast) or forecast[:2]
+            inputs[i] = RecommendationInput(location=loc, forecast=forecast, weekend_days=weekend)
+
+        recommendations = await asyncio.gather(*(arecommend_batched(inp, model=model) for inp in inputs.values()))
+        results = dict(zip(inputs, recommendations))
+    return [results[i] if i in results else _not_found_message(query) for i, query in enumerate(location_queries)]
@@ -1,13 +1,18 @@
 """
-Flask API for the weekend outdoor activity recommendation agent.
+Quart (async Flask) API for the weekend outdoor activity recommendation agent.
 """
 
 from __future__ import annotations
 
+import contextlib
+import gzip
 import os
-from typing import Optional
+import re
+import unicodedata
+from typing import AsyncIterator, Optional
 
-from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from quart import Quart, Response, request, jsonify
 
 try:
     from dotenv import load_dotenv
@@ -15,53 +20,269 @@ try:
 except ImportError:
     pass
 
-from agent import get_weekend_recommendation
+from agent import (
+    aget_weekend_recommendation,
+    aget_weekend_recommendation_stream,
+    aget_weekend_recommendations,
+    async_session,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider that serializes with orjson; jsonify() goes through this.
+
+    Keys are sorted per `sort_keys` and anything orjson does not encode natively
+    (Decimal, dates as HTTP dates, `__html__` objects) goes through the inherited
+    `default`, as with the stdlib provider. Unlike it, output is always compact and
+    non-ASCII text is not escaped. Calls passing other json.dumps/loads options fall
+    back to the stdlib provider.
+    """
+
+    def _dumpb(self, obj, default=None, sort_keys=None) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default or self.default, option=option)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs.keys() - {"default", "sort_keys"}:
+            return super().dumps(obj, **kwargs)
+        return self._dumpb(obj, **kwargs).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumpb(obj), mimetype=self.mimetype)
+
+
+app = Quart(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# One AsyncOpenAI client, Open-Meteo session and set of concurrency limits per worker
+# process, opened when it starts serving: OPENAI_MAX_CONCURRENCY and friends then bound
+# all requests together, and recommendations from concurrent requests are batched.
+_clients = contextlib.AsyncExitStack()
+
+
+@app.before_serving
+async def _open_clients() -> None:
+    await _clients.enter_async_context(async_session(process_wide=True))
+
+
+@app.after_serving
+async def _close_clients() -> None:
+    await _clients.aclose()
+
+# gzip the JSON responses for clients that accept it. Event streams are left alone
+# so chunks are not held back in a compression buffer.
+COMPRESS_LEVEL = 6
+COMPRESS_MIN_SIZE = 500
 
-app = Flask(__name__)
+
+@app.after_request
+async def _compress(response: Response) -> Response:
+    if response.mimetype != "application/json" or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    if not request.accept_encodings["gzip"]:
+        return response
+    data = await response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
+
+# Accepted location input (after NFC normalization): letters, combining marks and digits
+# in any script, plus space and , . - ' up to 80 chars. Marks (Unicode category M) are
+# needed for Indic/Thai names and decomposed accents. Rejecting junk here saves a
+# geocoding round-trip.
+_LOCATION_MAX_LEN = 80
+_LOCATION_PUNCT = frozenset(" ,.-'")
+
+
+def _normalize_location(raw) -> str:
+    return unicodedata.normalize("NFC", str(raw)).strip()
+
+
+def _is_valid_location(location: str) -> bool:
+    return 0 < len(location) <= _LOCATION_MAX_LEN and all(
+        c in _LOCATION_PUNCT or unicodedata.category(c)[0] in "LMN" for c in location
+    )
+
+
+# Upper bound on locations per /recommend_batch call.
+MAX_BATCH_LOCATIONS = 10
+
+# Recommendations are built from forecasts cached for ~10 minutes (see weather.py),
+# so let the client reuse a response for the same window.
+RECOMMEND_CACHE_CONTROL = "private, max-age=600"
 
 
 @app.route("/health", methods=["GET"])
-def health():
+async def health():
     """Liveness/readiness check for GCP Cloud Run."""
     return jsonify({"status": "ok"}), 200
 
 
+async def _read_request() -> tuple[Optional[str], Optional[str]]:
+    """Pull (location, model) from the query string (GET) or JSON body (POST)."""
+    if request.method == "GET":
+        location = request.args.get("location")
+        model = request.args.get("model") or None
+    else:
+        body = await request.get_json(silent=True) or {}
+        location = body.get("location")
+        model = body.get("model")
+
+    location = _normalize_location(location) if location else ""
+    if not location:
+        return None, None
+    return location, (str(model).strip() if model else None)
+
+
+def _missing_location_response():
+    return jsonify({
+        "error": "Missing required field: location",
+        "usage": "GET /recommend?location=San+Francisco or POST /recommend with JSON {\"location\": \"San Francisco\"}",
+    }), 400
+
+
+def _invalid_location_response():
+    return jsonify({
+        "error": "Invalid location: use up to 80 letters, digits, spaces and , . - ' characters",
+    }), 400
+
+
+def _error_response(e: Exception):
+    if isinstance(e, ValueError):
+        # Missing OPENAI_API_KEY is a server configuration error, not bad client input
+        status = 500 if "OPENAI_API_KEY" in str(e) else 400
+        return jsonify({"error": str(e)}), status
+    return jsonify({"error": str(e)}), 500
+
+
 @app.route("/recommend", methods=["GET", "POST"])
-def recommend():
+async def recommend():
     """
     Get weekend outdoor activity recommendations for a location.
 
     GET:  /recommend?location=San+Francisco&model=gpt-4o-mini
     POST: body {"location": "San Francisco", "model": "gpt-4o-mini"} (model optional)
     """
-    if request.method == "GET":
-        location = request.args.get("location")
-        model = request.args.get("model") or None
-    else:
-        body = request.get_json(silent=True) or {}
-        location = body.get("location")
-        model = body.get("model")
+    location, model = await _read_request()
+    if location is None:
+        return _missing_location_response()
+    if not _is_valid_location(location):
+        return _invalid_location_response()
+
+    try:
+        recommendation = await aget_weekend_recommendation(location, model=model)
+        response = jsonify({"location": location, "recommendation": recommendation})
+        response.headers["Cache-Control"] = RECOMMEND_CACHE_CONTROL
+        return response, 200
+    except Exception as e:
+        return _error_response(e)
+
+
+# SSE treats CRLF, a lone CR and LF alike as line ends.
+_SSE_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+def _sse_frame(text: str, event: Optional[str] = None) -> str:
+    """One server-sent event; every line of `text` gets its own `data:` field."""
+    head = f"event: {event}\n" if event else ""
+    return head + "".join(f"data: {line}\n" for line in _SSE_LINE_BREAK.split(text)) + "\n"
 
-    if not location or not str(location).strip():
+
+async def _sse(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Frame text chunks as server-sent events, ending with an `event: done` message."""
+    try:
+        async for chunk in chunks:
+            yield _sse_frame(chunk)
+    except Exception as e:
+        yield _sse_frame(str(e), event="error")
+        return
+    yield _sse_frame("", event="done")
+
+
+@app.route("/recommend/stream", methods=["GET", "POST"])
+async def recommend_stream():
+    """
+    Same inputs as /recommend, but streams the recommendation as server-sent events
+    (text/event-stream) while the model generates it.
+    """
+    location, model = await _read_request()
+    if location is None:
+        return _missing_location_response()
+    if not _is_valid_location(location):
+        return _invalid_location_response()
+
+    try:
+        chunks = await aget_weekend_recommendation_stream(location, model=model)
+    except Exception as e:
+        return _error_response(e)
+    return Response(
+        _sse(chunks),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/recommend_batch", methods=["POST"])
+async def recommend_batch():
+    """
+    Get recommendations for several locations in one call; forecasts for all of them
+    are fetched with a single Open-Meteo request.
+
+    POST: body {"locations": ["San Francisco", "London"], "model": "gpt-4o-mini"} (model optional)
+    """
+    body = await request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    locations = body.get("locations")
+    model = str(body["model"]).strip() if body.get("model") else None
+
+    if not isinstance(locations, list) or not locations:
         return jsonify({
-            "error": "Missing required field: location",
-            "usage": "GET /recommend?location=San+Francisco or POST /recommend with JSON {\"location\": \"San Francisco\"}",
+            "error": "Missing required field: locations",
+            "usage": "POST /recommend_batch with JSON {\"locations\": [\"San Francisco\", \"London\"]}",
         }), 400
+    if len(locations) > MAX_BATCH_LOCATIONS:
+        return jsonify({"error": f"Too many locations: at most {MAX_BATCH_LOCATIONS} per request"}), 400
 
-    location = str(location).strip()
-    model = str(model).strip() if model else None
+    if not all(isinstance(loc, str) for loc in locations):
+        return _invalid_location_response()
+    locations = [_normalize_location(loc) for loc in locations]
+    if not all(_is_valid_location(loc) for loc in locations):
+        return _invalid_location_response()
 
     try:
-        recommendation = get_weekend_recommendation(location, model=model)
-        return jsonify({"location": location, "recommendation": recommendation}), 200
-    except ValueError as e:
-        # Missing OPENAI_API_KEY is a server configuration error, not bad client input
-        status = 500 if "OPENAI_API_KEY" in str(e) else 400
-        return jsonify({"error": str(e)}), status
+        recommendations = await aget_weekend_recommendations(locations, model=model)
+        response = jsonify({
+            "results": [
+                {"location": loc, "recommendation": rec} for loc, rec in zip(locations, recommendations)
+            ],
+        })
+        response.headers["Cache-Control"] = RECOMMEND_CACHE_CONTROL
+        return response, 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _error_response(e)
 
 
 if __name__ == "__main__":
+    # Quart's dev server, for local debugging only. In production run under hypercorn
+    # (see Dockerfile): hypercorn --bind 0.0.0.0:8080 --workers 2 app:app
     port = int(os.environ.get("PORT", 8080))
     app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEBUG", "0") == "1")
@@ -4,12 +4,15 @@ CLI for the weekend outdoor activity recommendation agent.
 Usage: python main.py "San Francisco"
        python main.py "London"
        python main.py "90210"
+       python main.py "Tokyo" --stream
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
 import sys
+from typing import Optional
 
 # Load .env if present (optional)
 try:
@@ -18,7 +21,17 @@ try:
 except ImportError:
     pass
 
-from agent import get_weekend_recommendation
+from agent import aget_weekend_recommendation, aget_weekend_recommendation_stream
+
+
+async def _run(location: str, model: Optional[str], stream: bool) -> None:
+    # A single call opens and closes its own clients, so no async_session() block here.
+    if stream:
+        async for chunk in await aget_weekend_recommendation_stream(location, model=model):
+            print(chunk, end="", flush=True)
+        print()
+        return
+    print(await aget_weekend_recommendation(location, model=model))
 
 
 def main() -> int:
@@ -36,11 +49,15 @@ def main() -> int:
         default=None,
         help="OpenAI model to use (default: gpt-4o-mini). Overrides OPENAI_MODEL env.",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the recommendation as it is generated instead of all at once.",
+    )
     args = parser.parse_args()
 
     try:
-        recommendation = get_weekend_recommendation(args.location, model=args.model)
-        print(recommendation)
+        asyncio.run(_run(args.location, args.model, args.stream))
         return 0
     except ValueError as e:
         print(f"Error: {e}", file=sys.stderr)
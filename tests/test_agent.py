@@ -2,16 +2,29 @@
 
 from __future__ import annotations
 
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
 
 import pytest
 
 from weather import Location, DayForecast
 from agent import (
+    PROMPT_CACHE_KEY,
+    SYSTEM_INSTRUCTIONS,
     RecommendationInput,
     _weekend_forecast,
     recommend,
+    recommend_stream,
+    arecommend,
+    arecommend_batched,
     get_weekend_recommendation,
+    get_weekend_recommendation_stream,
+    get_weekend_recommendations,
+    aget_weekend_recommendation,
+    aget_weekend_recommendation_stream,
+    aget_weekend_recommendations,
+    arecommend_stream,
+    async_session,
 )
 
 
@@ -55,6 +68,15 @@ def test_weekend_forecast_empty_falls_back():
     assert weekend[0].date == "2026-02-09" and weekend[1].date == "2026-02-10"
 
 
+def test_weekend_forecast_starting_sunday_keeps_date_order():
+    # 2026-02-15 is Sun; the following Sat is the 7th day
+    forecast = _forecast_for_dates(
+        ["2026-02-15", "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20", "2026-02-21"]
+    )
+    weekend = _weekend_forecast(forecast)
+    assert [d.date for d in weekend] == ["2026-02-15", "2026-02-21"]
+
+
 def test_weekend_forecast_single_day_returns_one():
     forecast = _forecast_for_dates(["2026-02-14"])  # Saturday
     weekend = _weekend_forecast(forecast)
@@ -102,9 +124,12 @@ def test_recommend_returns_message_content(sample_input):
     mock_client.chat.completions.create.assert_called_once()
     call_kw = mock_client.chat.completions.create.call_args[1]
     assert call_kw["model"] == "gpt-4o-mini"
-    assert len(call_kw["messages"]) == 1
-    assert "San Francisco" in call_kw["messages"][0]["content"]
-    assert "2026-02-14" in call_kw["messages"][0]["content"]
+    assert len(call_kw["messages"]) == 2
+    assert call_kw["messages"][0] == {"role": "system", "content": SYSTEM_INSTRUCTIONS}
+    assert call_kw["messages"][1]["role"] == "user"
+    assert "San Francisco" in call_kw["messages"][1]["content"]
+    assert "2026-02-14" in call_kw["messages"][1]["content"]
+    assert call_kw["extra_body"] == {"prompt_cache_key": PROMPT_CACHE_KEY}
 
 
 def test_recommend_empty_content_returns_empty_string(sample_input):
@@ -122,6 +147,28 @@ def test_recommend_empty_content_returns_empty_string(sample_input):
     assert result == ""
 
 
+def test_recommend_stream_yields_content_deltas(sample_input):
+    def _chunk(content):
+        c = MagicMock()
+        c.choices = [MagicMock()]
+        c.choices[0].delta.content = content
+        return c
+
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.return_value = iter([_chunk("Hike "), _chunk(None), _chunk("Twin Peaks.")])
+
+    with patch("agent._get_client", return_value=mock_client):
+        chunks = list(recommend_stream(sample_input, model="gpt-4o-mini"))
+    assert chunks == ["Hike ", "Twin Peaks."]
+    assert mock_client.chat.completions.create.call_args[1]["stream"] is True
+
+
+def test_get_weekend_recommendation_stream_unknown_location():
+    with patch("agent.geocode", return_value=[]):
+        chunks = list(get_weekend_recommendation_stream("Nowhereville"))
+    assert len(chunks) == 1 and "Could not find a location" in chunks[0]
+
+
 def test_get_client_raises_without_api_key():
     from agent import _get_client
     with patch.dict("os.environ", {"OPENAI_API_KEY": ""}, clear=False):
@@ -185,3 +232,369 @@ def test_get_weekend_recommendation_passes_model():
                 get_weekend_recommendation("Paris", model="gpt-4o")
     rec_mock.assert_called_once()
     assert rec_mock.call_args[1]["model"] == "gpt-4o"
+
+
+def test_get_weekend_recommendations_batches_forecasts(sample_location):
+    forecast = _forecast_for_dates(["2026-02-13", "2026-02-14", "2026-02-15"])
+
+    def fake_geocode(query):
+        return [sample_location] if query == "San Francisco" else []
+
+    with patch("agent.geocode", side_effect=fake_geocode):
+        with patch("agent.get_forecast_batch", return_value=[forecast]) as batch_mock:
+            with patch("agent.recommend", return_value="Hike Lands End.") as rec_mock:
+                results = get_weekend_recommendations(["San Francisco", "Nowhereville"], model="gpt-4o")
+    assert results[0] == "Hike Lands End."
+    assert "Could not find a location" in results[1]
+    batch_mock.assert_called_once_with([(37.77, -122.42, "America/Los_Angeles")])
+    input_data = rec_mock.call_args[0][0]
+    assert [d.date for d in input_data.weekend_days] == ["2026-02-14", "2026-02-15"]
+    assert rec_mock.call_args[1]["model"] == "gpt-4o"
+
+
+# --- async variants ---
+
+
+def test_arecommend_returns_message_content(sample_input):
+    mock_choice = MagicMock()
+    mock_choice.message.content = "Picnic at Dolores Park."
+    mock_response = MagicMock()
+    mock_response.choices = [mock_choice]
+
+    mock_client = MagicMock()
+    mock_client.close = AsyncMock()
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        result = asyncio.run(arecommend(sample_input, model="gpt-4o-mini"))
+    assert result == "Picnic at Dolores Park."
+    call_kw = mock_client.chat.completions.create.call_args[1]
+    assert call_kw["model"] == "gpt-4o-mini"
+    assert call_kw["messages"][0]["content"] == SYSTEM_INSTRUCTIONS
+    assert "San Francisco" in call_kw["messages"][1]["content"]
+
+
+def test_aget_weekend_recommendation_unknown_location():
+    with patch("agent.ageocode", AsyncMock(return_value=[])):
+        result = asyncio.run(aget_weekend_recommendation("Nowhereville"))
+    assert "Could not find a location" in result
+
+
+def test_aget_weekend_recommendation_success(sample_location):
+    forecast = _forecast_for_dates(
+        ["2026-02-12", "2026-02-13", "2026-02-14", "2026-02-15", "2026-02-16", "2026-02-17", "2026-02-18"]
+    )
+
+    with patch("agent.ageocode", AsyncMock(return_value=[sample_location])):
+        with patch("agent.aget_forecast", AsyncMock(return_value=forecast)):
+            with patch("agent.arecommend", AsyncMock(return_value="Walk the Embarcadero.")) as rec_mock:
+                result = asyncio.run(aget_weekend_recommendation("San Francisco", model="gpt-4o"))
+    assert result == "Walk the Embarcadero."
+    input_data = rec_mock.call_args[0][0]
+    assert [d.date for d in input_data.weekend_days] == ["2026-02-14", "2026-02-15"]
+    assert rec_mock.call_args[1]["model"] == "gpt-4o"
+
+
+def test_aget_weekend_recommendation_outside_a_block_skips_the_batcher(sample_location):
+    forecast = _forecast_for_dates(["2026-02-14", "2026-02-15"])
+    mock_client = _async_client_returning("Walk the Embarcadero.")
+
+    with patch("agent.ageocode", AsyncMock(return_value=[sample_location])):
+        with patch("agent.aget_forecast", AsyncMock(return_value=forecast)):
+            with patch("agent._get_async_client", return_value=mock_client):
+                with patch("agent._PendingBatch", side_effect=AssertionError("batcher used")):
+                    result = asyncio.run(aget_weekend_recommendation("San Francisco"))
+    assert result == "Walk the Embarcadero."
+
+
+def _delta(content):
+    c = MagicMock()
+    c.choices = [MagicMock()]
+    c.choices[0].delta.content = content
+    return c
+
+
+class _FakeAsyncStream:
+    def __init__(self, chunks) -> None:
+        self._chunks = iter(chunks)
+        self.close = AsyncMock()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def test_arecommend_stream_yields_deltas_and_releases_its_client(sample_input):
+    stream = _FakeAsyncStream([_delta("Hike "), _delta(None), _delta("Twin Peaks.")])
+    mock_client = MagicMock()
+    mock_client.close = AsyncMock()
+    mock_client.chat.completions.create = AsyncMock(return_value=stream)
+
+    async def run():
+        chunks = await arecommend_stream(sample_input, model="gpt-4o-mini")
+        mock_client.chat.completions.create.assert_awaited_once()
+        mock_client.close.assert_not_awaited()
+        return [chunk async for chunk in chunks]
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        assert asyncio.run(run()) == ["Hike ", "Twin Peaks."]
+    assert mock_client.chat.completions.create.call_args[1]["stream"] is True
+    stream.close.assert_awaited_once()
+    mock_client.close.assert_awaited_once()
+
+
+def test_arecommend_stream_error_before_streaming_closes_client(sample_input):
+    mock_client = MagicMock()
+    mock_client.close = AsyncMock()
+    mock_client.chat.completions.create = AsyncMock(side_effect=RuntimeError("rate limited"))
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        with pytest.raises(RuntimeError):
+            asyncio.run(arecommend_stream(sample_input))
+    mock_client.close.assert_awaited_once()
+
+
+def test_aget_weekend_recommendation_stream_unknown_location():
+    async def run():
+        return [chunk async for chunk in await aget_weekend_recommendation_stream("Nowhereville")]
+
+    with patch("agent.ageocode", AsyncMock(return_value=[])):
+        chunks = asyncio.run(run())
+    assert len(chunks) == 1 and "Could not find a location" in chunks[0]
+
+
+def test_aget_weekend_recommendations_batches_forecasts_and_prompts(sample_location):
+    paris = Location("Paris", 48.85, 2.35, "Europe/Paris", "France")
+    forecast = _forecast_for_dates(["2026-02-14", "2026-02-15"])
+    mock_client = _async_client_returning('{"recommendations": ["SF plan", "Paris plan"]}')
+
+    async def fake_ageocode(query):
+        return {"San Francisco": [sample_location], "Paris": [paris]}.get(query, [])
+
+    with patch("agent.ageocode", fake_ageocode):
+        with patch("agent.aget_forecast_batch", AsyncMock(return_value=[forecast, forecast])) as batch_mock:
+            with patch("agent._get_async_client", return_value=mock_client):
+                results = asyncio.run(aget_weekend_recommendations(["San Francisco", "Nowhereville", "Paris"]))
+    assert results[0] == "SF plan" and results[2] == "Paris plan"
+    assert "Could not find a location" in results[1]
+    assert [c[:2] for c in batch_mock.call_args[0][0]] == [(37.77, -122.42), (48.85, 2.35)]
+    mock_client.chat.completions.create.assert_called_once()
+
+
+# --- arecommend_batched (request coalescing) ---
+
+
+def _async_client_returning(content: str) -> MagicMock:
+    mock_choice = MagicMock()
+    mock_choice.message.content = content
+    mock_response = MagicMock()
+    mock_response.choices = [mock_choice]
+    mock_client = MagicMock()
+    mock_client.close = AsyncMock()
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+    return mock_client
+
+
+def _input_for(location: Location) -> RecommendationInput:
+    weekend = _forecast_for_dates(["2026-02-14", "2026-02-15"])
+    return RecommendationInput(location=location, forecast=weekend, weekend_days=weekend)
+
+
+def test_arecommend_batched_coalesces_concurrent_requests(sample_location):
+    paris = Location("Paris", 48.85, 2.35, "Europe/Paris", "France")
+    mock_client = _async_client_returning('{"recommendations": ["SF plan", "Paris plan"]}')
+
+    async def run():
+        async with async_session():
+            return await asyncio.gather(
+                arecommend_batched(_input_for(sample_location), model="gpt-4o-mini"),
+                arecommend_batched(_input_for(paris), model="gpt-4o-mini"),
+            )
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        results = asyncio.run(run())
+    assert results == ["SF plan", "Paris plan"]
+    mock_client.chat.completions.create.assert_called_once()
+    messages = mock_client.chat.completions.create.call_args[1]["messages"]
+    assert messages[0]["content"].startswith(SYSTEM_INSTRUCTIONS)
+    user_content = messages[1]["content"]
+    assert "San Francisco" in user_content and "Paris" in user_content
+
+
+def test_arecommend_batched_single_request_uses_plain_call(sample_location):
+    mock_client = _async_client_returning("Just one plan.")
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        with patch("agent._PendingBatch", side_effect=AssertionError("batcher used")):
+            result = asyncio.run(arecommend_batched(_input_for(sample_location)))
+    assert result == "Just one plan."
+    assert mock_client.chat.completions.create.call_args[1]["messages"][0]["content"] == SYSTEM_INSTRUCTIONS
+
+
+def test_arecommend_batched_malformed_reply_falls_back_to_individual_calls(sample_location):
+    paris = Location("Paris", 48.85, 2.35, "Europe/Paris", "France")
+    mock_client = _async_client_returning('{"recommendations": ["only one"]}')
+
+    async def run():
+        async with async_session():
+            return await asyncio.gather(
+                arecommend_batched(_input_for(sample_location)),
+                arecommend_batched(_input_for(paris)),
+            )
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        results = asyncio.run(run())
+    assert len(results) == 2
+    # one combined attempt, then one call per request
+    assert mock_client.chat.completions.create.call_count == 3
+
+
+def test_arecommend_batched_propagates_errors(sample_location):
+    with patch("agent._get_async_client", side_effect=ValueError("OPENAI_API_KEY is not set")):
+        with pytest.raises(ValueError):
+            asyncio.run(arecommend_batched(_input_for(sample_location)))
+
+
+def test_aget_weekend_recommendations_in_one_block_share_a_completion(sample_location):
+    paris = Location("Paris", 48.85, 2.35, "Europe/Paris", "France")
+    forecast = _forecast_for_dates(["2026-02-14", "2026-02-15"])
+    mock_client = _async_client_returning('{"recommendations": ["SF plan", "Paris plan"]}')
+
+    async def fake_ageocode(query):
+        return [sample_location if query == "San Francisco" else paris]
+
+    async def run():
+        async with async_session():
+            return await asyncio.gather(
+                aget_weekend_recommendation("San Francisco"),
+                aget_weekend_recommendation("Paris"),
+            )
+
+    with patch("agent.ageocode", fake_ageocode), patch("agent.aget_forecast", AsyncMock(return_value=forecast)):
+        with patch("agent._get_async_client", return_value=mock_client):
+            results = asyncio.run(run())
+    assert results == ["SF plan", "Paris plan"]
+    mock_client.chat.completions.create.assert_called_once()
+    mock_client.close.assert_awaited_once()
+
+
+def test_arecommend_batched_drops_flush_task_when_idle(sample_location):
+    from agent import _ASYNC_SCOPE
+
+    mock_client = _async_client_returning("Just one plan.")
+
+    async def run():
+        async with async_session():
+            await arecommend_batched(_input_for(sample_location))
+            return _ASYNC_SCOPE.get().batch()._task
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        assert asyncio.run(run()) is None
+
+
+def test_weekday_matches_calendar():
+    from agent import _weekday
+    assert _weekday("2026-02-14") == 5  # Saturday
+    assert _weekday("2026-02-16") == 0  # Monday
+    assert _weekday("2024-02-29") == 3  # leap day, Thursday
+
+
+def test_get_client_is_reused_per_api_key():
+    from agent import _get_client, _cached_client
+    _cached_client.cache_clear()
+    try:
+        with patch.dict("os.environ", {"OPENAI_API_KEY": "sk-one"}, clear=False):
+            first = _get_client()
+            assert _get_client() is first
+        with patch.dict("os.environ", {"OPENAI_API_KEY": "sk-two"}, clear=False):
+            assert _get_client() is not first
+    finally:
+        _cached_client.cache_clear()
+
+
+def test_user_context_skips_missing_region():
+    from agent import _user_context
+    paris = Location("Paris", 48.85, 2.35, "Europe/Paris", "France")
+    prompt = _user_context(_input_for(paris))
+    assert "Location: Paris, France\n" in prompt
+    assert "Timezone: Europe/Paris" in prompt
+    assert "2026-02-14: 5–15°C, dry (0.0 mm)" in prompt
+    assert "Paris" not in SYSTEM_INSTRUCTIONS
+
+
+def test_arecommend_caps_concurrent_openai_calls(sample_input):
+    in_flight = 0
+    peak = 0
+
+    async def fake_create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return _async_client_returning("ok").chat.completions.create.return_value
+
+    mock_client = MagicMock()
+    mock_client.close = AsyncMock()
+    mock_client.chat.completions.create = fake_create
+
+    async def run():
+        async with async_session():
+            return await asyncio.gather(*(arecommend(sample_input) for _ in range(5)))
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        with patch("agent.OPENAI_MAX_CONCURRENCY", 2):
+            results = asyncio.run(run())
+    assert results == ["ok"] * 5
+    assert peak == 2
+
+
+def test_async_session_shares_one_client_and_closes_it(sample_input):
+    mock_client = _async_client_returning("ok")
+
+    async def run():
+        async with async_session():
+            results = await asyncio.gather(arecommend(sample_input), arecommend(sample_input))
+            mock_client.close.assert_not_awaited()
+            return results
+
+    with patch("agent._get_async_client", return_value=mock_client) as factory:
+        assert asyncio.run(run()) == ["ok", "ok"]
+    factory.assert_called_once()
+    mock_client.close.assert_awaited_once()
+
+
+def test_arecommend_outside_a_block_closes_its_client(sample_input):
+    mock_client = _async_client_returning("ok")
+
+    with patch("agent._get_async_client", return_value=mock_client):
+        asyncio.run(arecommend(sample_input))
+    mock_client.close.assert_awaited_once()
+
+
+def test_process_wide_session_serves_tasks_that_do_not_inherit_it(sample_input):
+    import contextlib
+    import agent
+
+    mock_client = _async_client_returning("ok")
+
+    async def run():
+        # Entered from another task, like a server startup hook.
+        stack = contextlib.AsyncExitStack()
+        await asyncio.create_task(stack.enter_async_context(async_session(process_wide=True)))
+        assert agent._ASYNC_SCOPE.get() is None and agent._DEFAULT_SCOPE is not None
+        results = await asyncio.gather(arecommend(sample_input), arecommend(sample_input))
+        mock_client.close.assert_not_awaited()
+        await asyncio.create_task(stack.aclose())
+        return results
+
+    with patch("agent._get_async_client", return_value=mock_client) as factory:
+        assert asyncio.run(run()) == ["ok", "ok"]
+    factory.assert_called_once()
+    mock_client.close.assert_awaited_once()
+    assert agent._DEFAULT_SCOPE is None
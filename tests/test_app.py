@@ -1,7 +1,9 @@
-"""Unit tests for Flask API (app.py)."""
+"""Unit tests for the Quart API (app.py)."""
 
 from __future__ import annotations
 
+import asyncio
+import json
 from unittest.mock import patch
 
 import pytest
@@ -10,17 +12,75 @@ import pytest
 from app import app
 
 
+class _Result:
+    """A fully read test response, so assertions can stay synchronous."""
+
+    def __init__(self, response, data: bytes) -> None:
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.mimetype = response.mimetype
+        self.data = data
+
+    def get_data(self, as_text: bool = False):
+        return self.data.decode() if as_text else self.data
+
+    def get_json(self):
+        return json.loads(self.data)
+
+
+class _SyncClient:
+    """Blocking wrapper around Quart's async test client."""
+
+    def __init__(self, client) -> None:
+        self._client = client
+
+    def get(self, *args, **kwargs) -> _Result:
+        return self._request(self._client.get, *args, **kwargs)
+
+    def post(self, *args, **kwargs) -> _Result:
+        return self._request(self._client.post, *args, **kwargs)
+
+    @staticmethod
+    def _request(method, *args, **kwargs) -> _Result:
+        async def run():
+            response = await method(*args, **kwargs)
+            return _Result(response, await response.get_data())
+
+        return asyncio.run(run())
+
+
+async def _achunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
 @pytest.fixture
 def client():
     app.config["TESTING"] = True
-    with app.test_client() as c:
-        yield c
+    return _SyncClient(app.test_client())
 
 
 def test_health_returns_200(client):
     r = client.get("/health")
     assert r.status_code == 200
     assert r.get_json() == {"status": "ok"}
+    assert r.mimetype == "application/json"
+
+
+def test_serving_opens_one_process_wide_session_and_closes_it():
+    import agent
+    import weather
+
+    async def run():
+        async with app.test_app():
+            assert agent._DEFAULT_SCOPE is not None
+            session = weather._AIO_DEFAULT[0]
+            assert not session.closed
+        return session
+
+    session = asyncio.run(run())
+    assert session.closed
+    assert agent._DEFAULT_SCOPE is None and weather._AIO_DEFAULT is None
 
 
 def test_recommend_missing_location_get_returns_400(client):
@@ -34,9 +94,44 @@ def test_recommend_missing_location_post_returns_400(client):
     assert r.status_code == 400
 
 
+@pytest.mark.parametrize(
+    "location",
+    ["<script>alert(1)</script>", "x" * 81, "Paris; DROP TABLE", "Ha\nNoi", "Ha\tNoi", "Ha Noi\r\nX"],
+)
+def test_recommend_invalid_location_returns_400_without_lookup(client, location):
+    with patch("app.aget_weekend_recommendation") as rec_mock:
+        r = client.post("/recommend", json={"location": location})
+    assert r.status_code == 400
+    assert "Invalid location" in r.get_json()["error"]
+    rec_mock.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "location",
+    [
+        "São Paulo",
+        "St. John's",
+        "Winston-Salem, NC",
+        "90210",
+        "東京",
+        "नई दिल्ली",  # Devanagari (combining vowel signs)
+        "กรุงเทพมหานคร",  # Thai
+        "சென்னை",  # Tamil
+        "Zu\u0308rich",  # NFD-decomposed "Zürich"
+    ],
+)
+def test_recommend_accepts_real_place_names(client, location):
+    import unicodedata
+
+    with patch("app.aget_weekend_recommendation", return_value="ok") as rec_mock:
+        r = client.post("/recommend", json={"location": location})
+    assert r.status_code == 200
+    assert rec_mock.call_args[0][0] == unicodedata.normalize("NFC", location)
+
+
 def test_recommend_value_error_openai_key_returns_500(client):
     """Server config error (missing OPENAI_API_KEY) must return 500, not 400."""
-    with patch("app.get_weekend_recommendation", side_effect=ValueError(
+    with patch("app.aget_weekend_recommendation", side_effect=ValueError(
         "OPENAI_API_KEY is not set. Create an API key at https://platform.openai.com/api-keys "
         "and set it in your environment or .env file."
     )):
@@ -46,9 +141,132 @@ def test_recommend_value_error_openai_key_returns_500(client):
 
 
 def test_recommend_success_returns_200(client):
-    with patch("app.get_weekend_recommendation", return_value="Visit the Eiffel Tower."):
+    with patch("app.aget_weekend_recommendation", return_value="Visit the Eiffel Tower."):
         r = client.get("/recommend?location=Paris")
     assert r.status_code == 200
     data = r.get_json()
     assert data["location"] == "Paris"
     assert data["recommendation"] == "Visit the Eiffel Tower."
+    assert r.headers["Cache-Control"] == "private, max-age=600"
+
+
+def test_recommend_error_is_not_cacheable(client):
+    with patch("app.aget_weekend_recommendation", side_effect=RuntimeError("boom")):
+        r = client.get("/recommend?location=Paris")
+    assert r.status_code == 500
+    assert "Cache-Control" not in r.headers
+
+
+def test_recommend_stream_returns_event_stream(client):
+    with patch("app.aget_weekend_recommendation_stream", return_value=_achunks("Visit ", "the Louvre.\nThen eat.")):
+        r = client.get("/recommend/stream?location=Paris")
+    assert r.status_code == 200
+    assert r.mimetype == "text/event-stream"
+    body = r.get_data(as_text=True)
+    assert body == (
+        "data: Visit \n\n"
+        "data: the Louvre.\ndata: Then eat.\n\n"
+        "event: done\ndata: \n\n"
+    )
+
+
+def test_recommend_stream_error_mid_stream_is_framed_per_line(client):
+    async def chunks():
+        yield "Go "
+        raise RuntimeError("upstream failed\nretry later")
+
+    with patch("app.aget_weekend_recommendation_stream", return_value=chunks()):
+        r = client.get("/recommend/stream?location=Paris")
+    assert r.get_data(as_text=True) == (
+        "data: Go \n\n"
+        "event: error\ndata: upstream failed\ndata: retry later\n\n"
+    )
+
+
+def test_recommend_stream_splits_carriage_returns_into_data_lines(client):
+    with patch("app.aget_weekend_recommendation_stream", return_value=_achunks("a\rb", "c\r\nd")):
+        r = client.get("/recommend/stream?location=Paris")
+    assert r.get_data(as_text=True) == (
+        "data: a\ndata: b\n\n"
+        "data: c\ndata: d\n\n"
+        "event: done\ndata: \n\n"
+    )
+
+
+def test_recommend_stream_missing_location_returns_400(client):
+    r = client.post("/recommend/stream", json={})
+    assert r.status_code == 400
+
+
+def test_recommend_stream_openai_key_error_returns_500(client):
+    with patch("app.aget_weekend_recommendation_stream", side_effect=ValueError("OPENAI_API_KEY is not set")):
+        r = client.get("/recommend/stream?location=Paris")
+    assert r.status_code == 500
+
+
+def test_recommend_gzips_large_json_when_accepted(client):
+    import gzip
+
+    text = "Walk along the Seine, then picnic in the Tuileries. " * 20
+    with patch("app.aget_weekend_recommendation", return_value=text):
+        r = client.get("/recommend?location=Paris", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(r.data))["recommendation"] == text
+
+
+def test_recommend_small_json_not_compressed(client):
+    with patch("app.aget_weekend_recommendation", return_value="Short."):
+        r = client.get("/recommend?location=Paris", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+
+
+def test_json_provider_matches_default_provider_output():
+    import datetime
+    import decimal
+
+    payload = {"b": decimal.Decimal("1.5"), "a": datetime.date(2026, 2, 14), 3: "three"}
+    assert app.json.dumps(payload) == '{"3":"three","a":"Sat, 14 Feb 2026 00:00:00 GMT","b":"1.5"}'
+    assert app.json.dumps({"b": 1, "a": 2}, sort_keys=False) == '{"b":1,"a":2}'
+    assert app.json.dumps({"b": 1, "a": 2}, indent=2) == '{\n  "a": 2,\n  "b": 1\n}'
+
+
+def test_recommend_batch_returns_results_in_order(client):
+    with patch("app.aget_weekend_recommendations", return_value=["Eiffel Tower.", "Hyde Park."]) as rec_mock:
+        r = client.post("/recommend_batch", json={"locations": ["Paris", " London "]})
+    assert r.status_code == 200
+    assert r.get_json() == {
+        "results": [
+            {"location": "Paris", "recommendation": "Eiffel Tower."},
+            {"location": "London", "recommendation": "Hyde Park."},
+        ]
+    }
+    rec_mock.assert_called_once_with(["Paris", "London"], model=None)
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {},
+        ["Paris"],
+        {"locations": []},
+        {"locations": "Paris"},
+        {"locations": ["Paris"] * 11},
+        {"locations": [None]},
+        {"locations": ["Paris", 75001]},
+        {"locations": [["Paris"]]},
+    ],
+)
+def test_recommend_batch_bad_input_returns_400(client, body):
+    with patch("app.aget_weekend_recommendations") as rec_mock:
+        r = client.post("/recommend_batch", json=body)
+    assert r.status_code == 400
+    assert "error" in r.get_json()
+    rec_mock.assert_not_called()
+
+
+def test_recommend_batch_invalid_location_returns_400(client):
+    with patch("app.aget_weekend_recommendations") as rec_mock:
+        r = client.post("/recommend_batch", json={"locations": ["Paris", "<b>"]})
+    assert r.status_code == 400
+    rec_mock.assert_not_called()
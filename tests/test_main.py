@@ -11,8 +11,13 @@ import pytest
 import main
 
 
+async def _achunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
 def test_main_success_prints_recommendation_and_returns_zero(capsys):
-    with patch("main.get_weekend_recommendation", return_value="Go hiking at dawn."):
+    with patch("main.aget_weekend_recommendation", return_value="Go hiking at dawn."):
         with patch.object(sys, "argv", ["main.py", "San Francisco"]):
             exit_code = main.main()
     assert exit_code == 0
@@ -22,7 +27,7 @@ def test_main_success_prints_recommendation_and_returns_zero(capsys):
 
 
 def test_main_success_with_model_flag(capsys):
-    with patch("main.get_weekend_recommendation", return_value="Nice day for a walk.") as rec_mock:
+    with patch("main.aget_weekend_recommendation", return_value="Nice day for a walk.") as rec_mock:
         with patch.object(sys, "argv", ["main.py", "London", "--model", "gpt-4o"]):
             exit_code = main.main()
     assert exit_code == 0
@@ -30,7 +35,7 @@ def test_main_success_with_model_flag(capsys):
 
 
 def test_main_value_error_returns_one_and_prints_to_stderr(capsys):
-    with patch("main.get_weekend_recommendation", side_effect=ValueError("OPENAI_API_KEY is not set")):
+    with patch("main.aget_weekend_recommendation", side_effect=ValueError("OPENAI_API_KEY is not set")):
         with patch.object(sys, "argv", ["main.py", "Tokyo"]):
             exit_code = main.main()
     assert exit_code == 1
@@ -40,7 +45,7 @@ def test_main_value_error_returns_one_and_prints_to_stderr(capsys):
 
 
 def test_main_generic_exception_returns_one(capsys):
-    with patch("main.get_weekend_recommendation", side_effect=RuntimeError("Network error")):
+    with patch("main.aget_weekend_recommendation", side_effect=RuntimeError("Network error")):
         with patch.object(sys, "argv", ["main.py", "Berlin"]):
             exit_code = main.main()
     assert exit_code == 1
@@ -49,9 +54,19 @@ def test_main_generic_exception_returns_one(capsys):
 
 
 def test_main_passes_location_to_agent(capsys):
-    with patch("main.get_weekend_recommendation", return_value="Done.") as rec_mock:
+    with patch("main.aget_weekend_recommendation", return_value="Done.") as rec_mock:
         with patch.object(sys, "argv", ["main.py", "90210"]):
             main.main()
     rec_mock.assert_called_once()
     assert rec_mock.call_args[0][0] == "90210"
     assert rec_mock.call_args[1].get("model") is None
+
+
+def test_main_stream_prints_chunks_as_they_arrive(capsys):
+    with patch("main.aget_weekend_recommendation_stream", return_value=_achunks("Go ", "surfing.")) as stream_mock:
+        with patch.object(sys, "argv", ["main.py", "Santa Cruz", "--stream"]):
+            exit_code = main.main()
+    assert exit_code == 0
+    stream_mock.assert_called_once_with("Santa Cruz", model=None)
+    out, _ = capsys.readouterr()
+    assert out == "Go surfing.\n"
@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
-from unittest.mock import patch, MagicMock
+import asyncio
+import contextlib
+import json
+from unittest.mock import patch, AsyncMock, MagicMock
 
+import aiohttp
 import pytest
 import requests
 
@@ -14,10 +18,46 @@ from weather import (
     DayForecast,
     geocode,
     get_forecast,
+    get_forecast_batch,
+    ageocode,
+    aget_forecast,
+    aget_forecast_batch,
+    aio_session,
     weather_summary,
+    OpenMeteoError,
+    _GEOCODE_CACHE,
 )
 
 
+def _json_bytes(payload: dict) -> bytes:
+    return json.dumps(payload).encode()
+
+
+def _fake_aio_session() -> MagicMock:
+    """Fake aiohttp session; stands in for weather._new_aio_session()."""
+    session = MagicMock()
+    session.close = AsyncMock()
+    return session
+
+
+def _aio_session_returning(payload: dict) -> MagicMock:
+    """Fake aiohttp session whose `get()` context manager yields `payload` as JSON."""
+    resp = MagicMock()
+    resp.read = AsyncMock(return_value=_json_bytes(payload))
+    session = _fake_aio_session()
+    session.get.return_value.__aenter__.return_value = resp
+    return session
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    geocode.cache_clear()
+    get_forecast.cache_clear()
+    yield
+    geocode.cache_clear()
+    get_forecast.cache_clear()
+
+
 # --- weather_summary (pure function, no I/O) ---
 
 
@@ -58,7 +98,7 @@ def test_weather_summary_multiple_days():
 def test_geocode_success():
     mock_response = MagicMock()
     mock_response.status_code = 200
-    mock_response.json.return_value = {
+    mock_response.content = _json_bytes({
         "results": [
             {
                 "name": "San Francisco",
@@ -69,10 +109,10 @@ def test_geocode_success():
                 "admin1": "California",
             }
         ]
-    }
+    })
     mock_response.raise_for_status = MagicMock()
 
-    with patch("weather.requests.get", return_value=mock_response) as get_mock:
+    with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
         locations = geocode("San Francisco", count=1)
         assert len(locations) == 1
         loc = locations[0]
@@ -91,10 +131,10 @@ def test_geocode_success():
 def test_geocode_empty_results():
     mock_response = MagicMock()
     mock_response.status_code = 200
-    mock_response.json.return_value = {"results": []}
+    mock_response.content = _json_bytes({"results": []})
     mock_response.raise_for_status = MagicMock()
 
-    with patch("weather.requests.get", return_value=mock_response):
+    with patch("weather._SESSION.get", return_value=mock_response):
         locations = geocode("Nowhereville")
         assert locations == []
 
@@ -102,10 +142,10 @@ def test_geocode_empty_results():
 def test_geocode_no_results_key():
     mock_response = MagicMock()
     mock_response.status_code = 200
-    mock_response.json.return_value = {}
+    mock_response.content = _json_bytes({})
     mock_response.raise_for_status = MagicMock()
 
-    with patch("weather.requests.get", return_value=mock_response):
+    with patch("weather._SESSION.get", return_value=mock_response):
         locations = geocode("Xyz")
         assert locations == []
 
@@ -114,18 +154,78 @@ def test_geocode_http_error():
     mock_response = MagicMock()
     mock_response.raise_for_status.side_effect = requests.HTTPError("500 Server Error")
 
-    with patch("weather.requests.get", return_value=mock_response):
+    with patch("weather._SESSION.get", return_value=mock_response):
         with pytest.raises(requests.HTTPError):
             geocode("San Francisco")
 
 
+def test_geocode_cached_case_insensitive():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes({
+        "results": [
+            {
+                "name": "London",
+                "latitude": 51.51,
+                "longitude": -0.13,
+                "timezone": "Europe/London",
+                "country": "United Kingdom",
+            }
+        ]
+    })
+
+    with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
+        first = geocode("London")
+        second = geocode("  london ")
+        third = geocode("LONDON\t")
+    assert first == second == third
+    assert second[0].name == "London"
+    get_mock.assert_called_once()
+
+
+def test_geocode_cache_expires():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes({"results": []})
+
+    with patch("weather._GEOCODE_TTL", 0.0):
+        with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
+            geocode("Xyz")
+            geocode("Xyz")
+    assert get_mock.call_count == 2
+
+
+def test_geocode_cache_evicts_oldest_when_full():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes({"results": []})
+
+    with patch("weather._GEOCODE_MAXSIZE", 2):
+        with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
+            for query in ("Aaa", "Bbb", "Ccc"):
+                geocode(query)
+            assert len(_GEOCODE_CACHE) == 2
+            geocode("Ccc")
+            assert get_mock.call_count == 3
+            geocode("Aaa")
+            assert get_mock.call_count == 4
+
+
+def test_geocode_cache_put_drops_expired_entries():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes({"results": []})
+
+    with patch("weather._GEOCODE_TTL", 0.0):
+        with patch("weather._SESSION.get", return_value=mock_response):
+            geocode("Aaa")
+            geocode("Bbb")
+    assert list(_GEOCODE_CACHE) == [("bbb", 1)]
+
+
 # --- get_forecast (mocked HTTP) ---
 
 
 def test_get_forecast_success():
     mock_response = MagicMock()
     mock_response.status_code = 200
-    mock_response.json.return_value = {
+    mock_response.content = _json_bytes({
         "daily": {
             "time": ["2026-02-14", "2026-02-15"],
             "temperature_2m_max": [16.0, 14.0],
@@ -133,10 +233,10 @@ def test_get_forecast_success():
             "precipitation_sum": [0.0, 5.2],
             "weathercode": [0, 61],
         }
-    }
+    })
     mock_response.raise_for_status = MagicMock()
 
-    with patch("weather.requests.get", return_value=mock_response) as get_mock:
+    with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
         forecasts = get_forecast(37.77, -122.42, "America/Los_Angeles", days=7)
         assert len(forecasts) == 2
         assert forecasts[0].date == "2026-02-14"
@@ -157,6 +257,318 @@ def test_get_forecast_http_error():
     mock_response = MagicMock()
     mock_response.raise_for_status.side_effect = requests.HTTPError("404")
 
-    with patch("weather.requests.get", return_value=mock_response):
+    with patch("weather._SESSION.get", return_value=mock_response):
         with pytest.raises(requests.HTTPError):
             get_forecast(0, 0, "UTC", days=7)
+
+
+def test_get_forecast_cached_by_rounded_coordinates():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes({
+        "daily": {
+            "time": ["2026-02-14"],
+            "temperature_2m_max": [16.0],
+            "temperature_2m_min": [7.0],
+            "precipitation_sum": [0.0],
+            "weathercode": [0],
+        }
+    })
+
+    with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
+        first = get_forecast(37.7749, -122.4194, "America/Los_Angeles", days=7)
+        second = get_forecast(37.7712, -122.4191, "America/Los_Angeles", days=7)
+        get_forecast(37.7749, -122.4194, "America/Los_Angeles", days=3)
+    assert first == second
+    assert get_mock.call_count == 2
+
+
+# --- async variants (mocked aiohttp session) ---
+
+
+def test_ageocode_success_and_shares_cache():
+    session = _aio_session_returning({
+        "results": [
+            {
+                "name": "Paris",
+                "latitude": 48.85,
+                "longitude": 2.35,
+                "timezone": "Europe/Paris",
+                "country": "France",
+            }
+        ]
+    })
+
+    with patch("weather._new_aio_session", return_value=session):
+        locations = asyncio.run(ageocode("Paris"))
+    assert locations[0].name == "Paris"
+    assert locations[0].admin1 is None
+    assert session.get.call_args[0][0] == GEOCODE_URL
+    assert session.get.call_args[1]["params"]["name"] == "Paris"
+
+    with patch("weather._SESSION.get") as get_mock:
+        assert geocode("paris") == locations
+    get_mock.assert_not_called()
+
+
+def test_aget_forecast_success():
+    session = _aio_session_returning({
+        "daily": {
+            "time": ["2026-02-14", "2026-02-15"],
+            "temperature_2m_max": [16.0, 14.0],
+            "temperature_2m_min": [7.0, 6.0],
+            "precipitation_sum": [0.0, 5.2],
+            "weathercode": [0, 61],
+        }
+    })
+
+    with patch("weather._new_aio_session", return_value=session):
+        forecasts = asyncio.run(aget_forecast(48.85, 2.35, "Europe/Paris", days=7))
+    assert [f.date for f in forecasts] == ["2026-02-14", "2026-02-15"]
+    assert forecasts[1].precipitation_mm == 5.2
+    assert session.get.call_args[0][0] == FORECAST_URL
+    assert session.get.call_args[1]["params"]["forecast_days"] == 7
+
+
+def test_session_pools_and_retries_open_meteo_calls():
+    from weather import _SESSION
+
+    adapter = _SESSION.get_adapter(FORECAST_URL)
+    assert adapter._pool_maxsize == 50
+    assert 429 in adapter.max_retries.status_forcelist
+    assert _SESSION.headers["Accept-Encoding"] == "gzip"
+
+
+def test_forecast_records_are_immutable():
+    import dataclasses
+
+    day = DayForecast("2026-02-14", 18.0, 8.0, 0.0, 0)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        day.temp_max_c = 30.0
+    assert not hasattr(day, "__dict__")
+
+
+def test_get_forecast_cache_hit_returns_fresh_list():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes({
+        "daily": {
+            "time": ["2026-02-14", "2026-02-15"],
+            "temperature_2m_max": [16.0, 14.0],
+            "temperature_2m_min": [7.0, 6.0],
+            "precipitation_sum": [0.0, 5.2],
+            "weathercode": [0, 61],
+        }
+    })
+
+    with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
+        first = get_forecast(51.51, -0.13, "Europe/London")
+        first.pop()
+        second = get_forecast(51.51, -0.13, "Europe/London")
+    get_mock.assert_called_once()
+    assert second == [
+        DayForecast("2026-02-14", 16.0, 7.0, 0.0, 0),
+        DayForecast("2026-02-15", 14.0, 6.0, 5.2, 61),
+    ]
+
+
+def test_aio_session_is_shared_in_block_and_closed_on_exit():
+    session = _aio_session_returning({"results": []})
+
+    async def run():
+        async with aio_session() as outer:
+            async with aio_session() as inner:
+                assert inner is outer
+            await asyncio.gather(ageocode("Aaa"), ageocode("Bbb"))
+            session.close.assert_not_awaited()
+
+    with patch("weather._new_aio_session", return_value=session) as factory:
+        asyncio.run(run())
+    factory.assert_called_once()
+    assert session.get.call_count == 2
+    session.close.assert_awaited_once()
+
+
+def test_async_calls_outside_a_block_close_their_session():
+    session = _aio_session_returning({"results": []})
+
+    with patch("weather._new_aio_session", return_value=session):
+        asyncio.run(ageocode("Nowhere"))
+    session.close.assert_awaited_once()
+
+
+def test_process_wide_aio_session_serves_tasks_that_do_not_inherit_it():
+    import contextlib
+    import weather
+
+    session = _aio_session_returning({"results": []})
+
+    async def run():
+        stack = contextlib.AsyncExitStack()
+        await asyncio.create_task(stack.enter_async_context(aio_session(process_wide=True)))
+        await asyncio.gather(ageocode("Aaa"), ageocode("Bbb"))
+        session.close.assert_not_awaited()
+        await stack.aclose()
+
+    with patch("weather._new_aio_session", return_value=session) as factory:
+        asyncio.run(run())
+    factory.assert_called_once()
+    session.close.assert_awaited_once()
+    assert weather._AIO_DEFAULT is None
+
+
+def test_aget_forecast_retries_rate_limited_calls():
+    limited = MagicMock(status=429)
+    ok = MagicMock(status=200)
+    ok.read = AsyncMock(return_value=_json_bytes({
+        "daily": {
+            "time": ["2026-02-14"],
+            "temperature_2m_max": [16.0],
+            "temperature_2m_min": [7.0],
+            "precipitation_sum": [0.0],
+            "weathercode": [0],
+        }
+    }))
+    session = _fake_aio_session()
+    session.get.return_value.__aenter__.side_effect = [limited, ok]
+
+    with patch("weather._new_aio_session", return_value=session):
+        with patch("weather.asyncio.sleep", AsyncMock()) as sleep_mock:
+            forecasts = asyncio.run(aget_forecast(0.0, 0.0, "UTC"))
+    assert forecasts[0].date == "2026-02-14"
+    assert session.get.call_count == 2
+    sleep_mock.assert_awaited_once()
+    limited.raise_for_status.assert_not_called()
+
+
+def test_aget_forecast_gives_up_after_retries():
+    limited = MagicMock(status=503)
+    limited.raise_for_status.side_effect = aiohttp.ClientResponseError(MagicMock(), (), status=503)
+    session = _fake_aio_session()
+    session.get.return_value.__aenter__.return_value = limited
+
+    with patch("weather._new_aio_session", return_value=session):
+        with patch("weather.asyncio.sleep", AsyncMock()):
+            with pytest.raises(aiohttp.ClientResponseError):
+                asyncio.run(aget_forecast(1.0, 1.0, "UTC"))
+    assert session.get.call_count == 4
+
+
+def test_aget_forecast_retries_connection_errors_and_timeouts():
+    ok = MagicMock(status=200)
+    ok.read = AsyncMock(return_value=_json_bytes(_daily_payload("2026-02-14", 16.0)))
+    session = _fake_aio_session()
+    session.get.return_value.__aenter__.side_effect = [
+        aiohttp.ClientConnectionError("reset"),
+        asyncio.TimeoutError(),
+        ok,
+    ]
+
+    with patch("weather._new_aio_session", return_value=session):
+        with patch("weather.asyncio.sleep", AsyncMock()) as sleep_mock:
+            forecasts = asyncio.run(aget_forecast(2.0, 2.0, "UTC"))
+    assert forecasts[0].temp_max_c == 16.0
+    assert session.get.call_count == 3
+    assert sleep_mock.await_count == 2
+
+
+def test_aget_forecast_reraises_connection_error_after_retries():
+    session = _fake_aio_session()
+    session.get.return_value.__aenter__.side_effect = aiohttp.ClientConnectionError("refused")
+
+    with patch("weather._new_aio_session", return_value=session):
+        with patch("weather.asyncio.sleep", AsyncMock()):
+            with pytest.raises(aiohttp.ClientConnectionError):
+                asyncio.run(aget_forecast(3.0, 3.0, "UTC"))
+    assert session.get.call_count == 4
+
+
+def _daily_payload(date: str, tmax: float) -> dict:
+    return {
+        "daily": {
+            "time": [date],
+            "temperature_2m_max": [tmax],
+            "temperature_2m_min": [tmax - 10],
+            "precipitation_sum": [0.0],
+            "weathercode": [0],
+        }
+    }
+
+
+def test_get_forecast_batch_single_request_for_all_points():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes([_daily_payload("2026-02-14", 16.0), _daily_payload("2026-02-14", 9.0)])
+
+    with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
+        results = get_forecast_batch([(37.77, -122.42, "America/Los_Angeles"), (51.51, -0.13, "Europe/London")])
+    get_mock.assert_called_once()
+    params = get_mock.call_args[1]["params"]
+    assert params["latitude"] == "37.77,51.51"
+    assert params["longitude"] == "-122.42,-0.13"
+    assert params["timezone"] == "America/Los_Angeles,Europe/London"
+    assert [r[0].temp_max_c for r in results] == [16.0, 9.0]
+
+
+def test_get_forecast_batch_only_fetches_uncached_points():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes(_daily_payload("2026-02-14", 16.0))
+    with patch("weather._SESSION.get", return_value=mock_response):
+        get_forecast(37.77, -122.42, "America/Los_Angeles")
+
+    # a single missing point comes back as an object, not a list
+    mock_response.content = _json_bytes(_daily_payload("2026-02-14", 9.0))
+    with patch("weather._SESSION.get", return_value=mock_response) as get_mock:
+        results = get_forecast_batch([(37.77, -122.42, "America/Los_Angeles"), (51.51, -0.13, "Europe/London")])
+    assert get_mock.call_args[1]["params"]["latitude"] == "51.51"
+    assert [r[0].temp_max_c for r in results] == [16.0, 9.0]
+
+
+def test_get_forecast_batch_count_mismatch_is_upstream_error():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes(_daily_payload("2026-02-14", 16.0))
+    with patch("weather._SESSION.get", return_value=mock_response):
+        with pytest.raises(OpenMeteoError):
+            get_forecast_batch([(37.77, -122.42, "America/Los_Angeles"), (51.51, -0.13, "Europe/London")])
+
+
+def test_aget_forecast_batch_shares_cache_and_one_request():
+    mock_response = MagicMock()
+    mock_response.content = _json_bytes(_daily_payload("2026-02-14", 16.0))
+    with patch("weather._SESSION.get", return_value=mock_response):
+        get_forecast(37.77, -122.42, "America/Los_Angeles")
+
+    session = _aio_session_returning([_daily_payload("2026-02-14", 9.0), _daily_payload("2026-02-14", 20.0)])
+    coords = [(37.77, -122.42, "America/Los_Angeles"), (51.51, -0.13, "Europe/London"), (35.68, 139.69, "Asia/Tokyo")]
+    with patch("weather._new_aio_session", return_value=session):
+        results = asyncio.run(aget_forecast_batch(coords))
+    session.get.assert_called_once()
+    assert session.get.call_args[1]["params"]["latitude"] == "51.51,35.68"
+    assert [r[0].temp_max_c for r in results] == [16.0, 9.0, 20.0]
+
+
+@pytest.mark.parametrize("use_msgspec", [True, False])
+def test_malformed_payloads_raise_upstream_error_not_value_error(use_msgspec):
+    from weather import _decode_forecasts, _decode_locations
+
+    with contextlib.nullcontext() if use_msgspec else patch("weather.msgspec", None):
+        for decode, content in [
+            (_decode_locations, _json_bytes({"results": [{"name": "Oslo", "latitude": "north"}]})),
+            (_decode_forecasts, _json_bytes({"hourly": {}})),
+            (_decode_forecasts, b"<html>Bad Gateway</html>"),
+        ]:
+            with pytest.raises(OpenMeteoError) as exc_info:
+                decode(content)
+            assert not isinstance(exc_info.value, ValueError)
+
+
+@pytest.mark.parametrize("use_msgspec", [True, False])
+def test_decoders_agree_with_and_without_msgspec(use_msgspec):
+    from weather import _decode_forecasts, _decode_locations
+
+    geo = _json_bytes({"results": [{"name": "Oslo", "latitude": 59.91, "longitude": 10.75,
+                                    "timezone": "Europe/Oslo", "country": "Norway", "population": 580000}]})
+    fc = _json_bytes(_daily_payload("2026-02-14", 2.0))
+    with contextlib.nullcontext() if use_msgspec else patch("weather.msgspec", None):
+        locations = _decode_locations(geo)
+        forecasts = _decode_forecasts(fc)
+        assert _decode_locations(b"{}") == []
+    assert locations == [Location("Oslo", 59.91, 10.75, "Europe/Oslo", "Norway")]
+    assert forecasts[0] == [DayForecast("2026-02-14", 2.0, -8.0, 0.0, 0)]
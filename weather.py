@@ -1,19 +1,63 @@
 """
 Weather and geocoding via Open-Meteo (free, no API key required).
+
+Blocking helpers (`geocode`, `get_forecast`) serve synchronous callers; the
+`ageocode` / `aget_forecast` variants, used by the CLI and the Quart app, do the
+same over aiohttp.
+Both share the same in-process caches; wrap batches of async calls in
+`async with aio_session():` so they share (and then close) one connection pool.
 """
 
 from __future__ import annotations
 
-import requests
+import asyncio
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, AsyncIterator, Optional, Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 
 
 GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
 FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
 
+DEFAULT_HEADERS = {"Accept-Encoding": "gzip"}
+_DAILY_FIELDS = "temperature_2m_max,temperature_2m_min,precipitation_sum,weathercode"
+
+# Shared, pooled session so repeat calls reuse TCP/TLS connections to Open-Meteo.
+_SESSION = requests.Session()
+_SESSION.headers.update(DEFAULT_HEADERS)
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=50,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+    ),
+)
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class Location:
     """Resolved location from geocoding."""
 
@@ -25,7 +69,7 @@ class Location:
     admin1: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DayForecast:
     """Daily weather summary for one day."""
 
@@ -36,71 +80,378 @@ class DayForecast:
     weather_code: int  # WMO code
 
 
+class OpenMeteoError(RuntimeError):
+    """Open-Meteo returned a response we could not use (malformed or unexpected shape)."""
+
+
+if msgspec is not None:
+    # Typed shapes of the Open-Meteo responses; msgspec decodes straight into these
+    # (and into Location) without building intermediate dicts.
+
+    class _GeocodePayload(msgspec.Struct):
+        results: Optional[list[Location]] = None
+
+    class _DailyPayload(msgspec.Struct):
+        time: list[str]
+        temperature_2m_max: list[Optional[float]]
+        temperature_2m_min: list[Optional[float]]
+        precipitation_sum: list[Optional[float]]
+        weathercode: list[Optional[int]]
+
+    class _ForecastPayload(msgspec.Struct):
+        daily: _DailyPayload
+
+    _GEOCODE_DECODER = msgspec.json.Decoder(_GeocodePayload)
+    _FORECAST_DECODER = msgspec.json.Decoder(Union[list[_ForecastPayload], _ForecastPayload])
+
+# Decoding failures of an upstream payload; msgspec.DecodeError and ValidationError are
+# both ValueError subclasses, as are orjson/json decode errors.
+_DECODE_ERRORS = (ValueError, KeyError, TypeError, AttributeError)
+
+
+# Geocoding results are effectively static, so cache them for a day by default.
+# Keys come from user input, so the caches are also capped in size (oldest out).
+_GEOCODE_TTL = float(os.environ.get("GEOCODE_TTL", "86400"))
+_GEOCODE_MAXSIZE = int(os.environ.get("GEOCODE_CACHE_SIZE", "1024"))
+_GEOCODE_CACHE: dict[tuple[str, int], tuple[float, list[Location]]] = {}
+_GEOCODE_LOCK = threading.Lock()
+
+# Forecasts change a few times a day; 10 minutes keeps them fresh enough. Coordinates
+# are rounded to 2 decimals (~1 km) so near-identical lookups share an entry. This is
+# per-process: with several Cloud Run instances, a shared store (e.g. Redis) would
+# slot in here.
+_FORECAST_TTL = float(os.environ.get("FORECAST_TTL", "600"))
+_FORECAST_MAXSIZE = int(os.environ.get("FORECAST_CACHE_SIZE", "1024"))
+_FORECAST_CACHE: dict[tuple, tuple[float, list[DayForecast]]] = {}
+_FORECAST_LOCK = threading.Lock()
+
+# The async API's aiohttp session (and its concurrency limit) lives for one
+# `async with aio_session():` block, tracked in a context variable so tasks started
+# inside the block share it. aiohttp sessions are bound to their event loop, which
+# rules out creating one at import time.
+_AIO_TIMEOUT = aiohttp.ClientTimeout(total=10)
+_AIO_SCOPE: ContextVar[Optional[tuple[aiohttp.ClientSession, asyncio.Semaphore]]] = ContextVar(
+    "weather_aio_scope", default=None
+)
+# Set by `aio_session(process_wide=True)` (e.g. from a server startup hook, whose
+# context the request tasks do not inherit); used where no block is active.
+_AIO_DEFAULT: Optional[tuple[aiohttp.ClientSession, asyncio.Semaphore]] = None
+
+# Concurrent async Open-Meteo calls per aio_session() block (per process for a
+# process-wide block), and retry policy mirroring the sync session's urllib3 Retry:
+# connection errors, timeouts and the listed statuses are retried 3 times with 0.2s
+# exponential backoff (plus jitter).
+METEO_MAX_CONCURRENCY = int(os.environ.get("METEO_MAX_CONCURRENCY", "20"))
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_AIO_RETRIES = 3
+_AIO_BACKOFF = 0.2
+
+
+def _cache_get(cache: dict, lock: threading.Lock, key: tuple, ttl: float) -> Any:
+    with lock:
+        hit = cache.get(key)
+    if hit is not None and time.monotonic() - hit[0] < ttl:
+        return hit[1]
+    return None
+
+
+def _cache_put(cache: dict, lock: threading.Lock, key: tuple, value: Any, ttl: float, maxsize: int) -> Any:
+    now = time.monotonic()
+    with lock:
+        # Re-inserting keeps the dict ordered by store time, so the oldest entry is
+        # always first: drop it while it has expired or the cache is full.
+        cache.pop(key, None)
+        while cache:
+            oldest = next(iter(cache))
+            if len(cache) < maxsize and now - cache[oldest][0] < ttl:
+                break
+            del cache[oldest]
+        cache[key] = (now, value)
+    return value
+
+
+def _geocode_key(location_query: str, count: int) -> tuple[str, int]:
+    return (" ".join(location_query.lower().split()), count)
+
+
+def _geocode_params(location_query: str, count: int) -> dict[str, Any]:
+    return {"name": location_query, "count": count, "language": "en"}
+
+
+def _parse_locations(data: dict) -> list[Location]:
+    results = data.get("results") or []
+    # Positional construction; field order matches Location.
+    return [
+        Location(r["name"], r["latitude"], r["longitude"], r["timezone"], r["country"], r.get("admin1"))
+        for r in results
+    ]
+
+
+def _forecast_key(latitude: float, longitude: float, timezone: str, days: int) -> tuple:
+    return (round(latitude, 2), round(longitude, 2), timezone, days)
+
+
+def _forecast_params(latitude: float, longitude: float, timezone: str, days: int) -> dict[str, Any]:
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "timezone": timezone,
+        "forecast_days": days,
+        "daily": _DAILY_FIELDS,
+    }
+
+
+def _parse_forecast(data: dict) -> list[DayForecast]:
+    daily = data["daily"]
+    # Zip the columns straight into positional DayForecast(...) calls.
+    return list(map(
+        DayForecast,
+        daily["time"],
+        daily["temperature_2m_max"],
+        daily["temperature_2m_min"],
+        daily["precipitation_sum"],
+        daily["weathercode"],
+    ))
+
+
+def _decode_locations(content: bytes) -> list[Location]:
+    # Re-raised as OpenMeteoError so a bad upstream payload is not reported as a
+    # ValueError, which the app maps to a 400 for client input.
+    try:
+        if msgspec is not None:
+            return _GEOCODE_DECODER.decode(content).results or []
+        return _parse_locations(_json_loads(content))
+    except _DECODE_ERRORS as e:
+        raise OpenMeteoError("Unexpected geocoding response from Open-Meteo") from e
+
+
+def _decode_forecasts(content: bytes) -> list[list[DayForecast]]:
+    """
+    Decode a forecast response into one DayForecast list per point. Open-Meteo returns
+    a list for multi-point requests and a single object otherwise.
+    """
+    try:
+        if msgspec is not None:
+            payload = _FORECAST_DECODER.decode(content)
+            payloads = payload if isinstance(payload, list) else [payload]
+            return [
+                list(map(
+                    DayForecast,
+                    d.time,
+                    d.temperature_2m_max,
+                    d.temperature_2m_min,
+                    d.precipitation_sum,
+                    d.weathercode,
+                ))
+                for d in (p.daily for p in payloads)
+            ]
+        data = _json_loads(content)
+        payloads = data if isinstance(data, list) else [data]
+        return [_parse_forecast(p) for p in payloads]
+    except _DECODE_ERRORS as e:
+        raise OpenMeteoError("Unexpected forecast response from Open-Meteo") from e
+
+
 def geocode(location_query: str, count: int = 1) -> list[Location]:
     """
     Resolve a place name or postal code to coordinates and timezone.
     Returns a list of matching locations (best match first).
+    Results are cached in-process for GEOCODE_TTL seconds.
     """
-    resp = requests.get(
-        GEOCODE_URL,
-        params={"name": location_query, "count": count, "language": "en"},
-        timeout=10,
-    )
+    key = _geocode_key(location_query, count)
+    cached = _cache_get(_GEOCODE_CACHE, _GEOCODE_LOCK, key, _GEOCODE_TTL)
+    if cached is not None:
+        return list(cached)
+
+    resp = _SESSION.get(GEOCODE_URL, params=_geocode_params(location_query, count), timeout=10)
     resp.raise_for_status()
-    data = resp.json()
-    results = data.get("results") or []
-    return [
-        Location(
-            name=r["name"],
-            latitude=r["latitude"],
-            longitude=r["longitude"],
-            timezone=r["timezone"],
-            country=r["country"],
-            admin1=r.get("admin1"),
-        )
-        for r in results
-    ]
+    locations = _decode_locations(resp.content)
+    return list(_cache_put(_GEOCODE_CACHE, _GEOCODE_LOCK, key, locations, _GEOCODE_TTL, _GEOCODE_MAXSIZE))
+
+
+def _geocode_cache_clear() -> None:
+    with _GEOCODE_LOCK:
+        _GEOCODE_CACHE.clear()
+
+
+geocode.cache_clear = _geocode_cache_clear  # type: ignore[attr-defined]
 
 
 def get_forecast(latitude: float, longitude: float, timezone: str, days: int = 7) -> list[DayForecast]:
     """
     Fetch daily forecast for the next `days` days (includes weekend).
+    Results are cached in-process for FORECAST_TTL seconds.
     """
-    resp = requests.get(
+    key = _forecast_key(latitude, longitude, timezone, days)
+    cached = _cache_get(_FORECAST_CACHE, _FORECAST_LOCK, key, _FORECAST_TTL)
+    if cached is not None:
+        return list(cached)
+
+    resp = _SESSION.get(
         FORECAST_URL,
-        params={
-            "latitude": latitude,
-            "longitude": longitude,
-            "timezone": timezone,
-            "forecast_days": days,
-            "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,weathercode",
-        },
+        params=_forecast_params(latitude, longitude, timezone, days),
         timeout=10,
     )
     resp.raise_for_status()
-    data = resp.json()
-    daily = data["daily"]
-    n = len(daily["time"])
-    return [
-        DayForecast(
-            date=daily["time"][i],
-            temp_max_c=daily["temperature_2m_max"][i],
-            temp_min_c=daily["temperature_2m_min"][i],
-            precipitation_mm=daily["precipitation_sum"][i],
-            weather_code=daily["weathercode"][i],
+    forecast = _decode_forecasts(resp.content)[0]
+    return list(_cache_put(_FORECAST_CACHE, _FORECAST_LOCK, key, forecast, _FORECAST_TTL, _FORECAST_MAXSIZE))
+
+
+def _forecast_cache_clear() -> None:
+    with _FORECAST_LOCK:
+        _FORECAST_CACHE.clear()
+
+
+get_forecast.cache_clear = _forecast_cache_clear  # type: ignore[attr-defined]
+
+
+def _forecast_batch_params(coords: list[tuple[float, float, str]], days: int) -> dict[str, Any]:
+    return {
+        "latitude": ",".join(str(lat) for lat, _, _ in coords),
+        "longitude": ",".join(str(lon) for _, lon, _ in coords),
+        "timezone": ",".join(tz for _, _, tz in coords),
+        "forecast_days": days,
+        "daily": _DAILY_FIELDS,
+    }
+
+
+def _store_forecast_batch(
+    keys: list[tuple], results: list[Optional[list[DayForecast]]], missing: list[int], content: bytes
+) -> list[list[DayForecast]]:
+    fetched = _decode_forecasts(content)
+    if len(fetched) != len(missing):
+        raise OpenMeteoError(f"Expected {len(missing)} forecasts from Open-Meteo, got {len(fetched)}")
+    for i, forecast in zip(missing, fetched):
+        results[i] = _cache_put(
+            _FORECAST_CACHE, _FORECAST_LOCK, keys[i], forecast, _FORECAST_TTL, _FORECAST_MAXSIZE
         )
-        for i in range(n)
-    ]
+    return [list(forecast) for forecast in results]
+
+
+def get_forecast_batch(coords: list[tuple[float, float, str]], days: int = 7) -> list[list[DayForecast]]:
+    """
+    Fetch forecasts for several (latitude, longitude, timezone) points at once.
+    Cached points are served from memory; the rest share a single Open-Meteo request
+    (comma-separated coordinates). Returns one forecast list per input, in order.
+    """
+    keys = [_forecast_key(lat, lon, tz, days) for lat, lon, tz in coords]
+    results = [_cache_get(_FORECAST_CACHE, _FORECAST_LOCK, key, _FORECAST_TTL) for key in keys]
+    missing = [i for i, forecast in enumerate(results) if forecast is None]
+    if not missing:
+        return [list(forecast) for forecast in results]
+
+    resp = _SESSION.get(
+        FORECAST_URL,
+        params=_forecast_batch_params([coords[i] for i in missing], days),
+        timeout=10,
+    )
+    resp.raise_for_status()
+    return _store_forecast_batch(keys, results, missing, resp.content)
+
+
+def _new_aio_session() -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(timeout=_AIO_TIMEOUT, headers=DEFAULT_HEADERS)
+
+
+def _current_aio_scope() -> Optional[tuple[aiohttp.ClientSession, asyncio.Semaphore]]:
+    return _AIO_SCOPE.get() or _AIO_DEFAULT
+
+
+@contextlib.asynccontextmanager
+async def aio_session(process_wide: bool = False) -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    Share one pooled aiohttp session across the async calls awaited in this block,
+    and close it on exit. Nested blocks reuse the outer session; async calls made
+    outside any block open (and close) a session of their own.
+
+    With `process_wide=True` the session and the METEO_MAX_CONCURRENCY cap also serve
+    every other task on the event loop until the block exits, so a server can open it
+    once at startup and bound Open-Meteo traffic across all requests.
+    """
+    global _AIO_DEFAULT
+    scope = _current_aio_scope()
+    if scope is not None:
+        yield scope[0]
+        return
+
+    session = _new_aio_session()
+    scope = (session, asyncio.Semaphore(METEO_MAX_CONCURRENCY))
+    token = None
+    if process_wide:
+        _AIO_DEFAULT = scope
+    else:
+        token = _AIO_SCOPE.set(scope)
+    try:
+        yield session
+    finally:
+        if token is None:
+            _AIO_DEFAULT = None
+        else:
+            _AIO_SCOPE.reset(token)
+        await session.close()
+
+
+async def _aio_get(url: str, params: dict[str, Any]) -> bytes:
+    async with aio_session() as session:
+        semaphore = _current_aio_scope()[1]
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    async with session.get(url, params=params) as resp:
+                        if resp.status not in _RETRY_STATUSES or attempt >= _AIO_RETRIES:
+                            resp.raise_for_status()
+                            return await resp.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= _AIO_RETRIES:
+                    raise
+            # Back off outside the semaphore so waiting retries don't hold a slot.
+            await asyncio.sleep(_AIO_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+            attempt += 1
+
+
+async def ageocode(location_query: str, count: int = 1) -> list[Location]:
+    """Async variant of `geocode` (shares its cache)."""
+    key = _geocode_key(location_query, count)
+    cached = _cache_get(_GEOCODE_CACHE, _GEOCODE_LOCK, key, _GEOCODE_TTL)
+    if cached is not None:
+        return list(cached)
+
+    content = await _aio_get(GEOCODE_URL, _geocode_params(location_query, count))
+    locations = _decode_locations(content)
+    return list(_cache_put(_GEOCODE_CACHE, _GEOCODE_LOCK, key, locations, _GEOCODE_TTL, _GEOCODE_MAXSIZE))
+
+
+async def aget_forecast(latitude: float, longitude: float, timezone: str, days: int = 7) -> list[DayForecast]:
+    """Async variant of `get_forecast` (shares its cache)."""
+    key = _forecast_key(latitude, longitude, timezone, days)
+    cached = _cache_get(_FORECAST_CACHE, _FORECAST_LOCK, key, _FORECAST_TTL)
+    if cached is not None:
+        return list(cached)
+
+    content = await _aio_get(FORECAST_URL, _forecast_params(latitude, longitude, timezone, days))
+    forecast = _decode_forecasts(content)[0]
+    return list(_cache_put(_FORECAST_CACHE, _FORECAST_LOCK, key, forecast, _FORECAST_TTL, _FORECAST_MAXSIZE))
+
+
+async def aget_forecast_batch(coords: list[tuple[float, float, str]], days: int = 7) -> list[list[DayForecast]]:
+    """Async variant of `get_forecast_batch` (shares its cache)."""
+    keys = [_forecast_key(lat, lon, tz, days) for lat, lon, tz in coords]
+    results = [_cache_get(_FORECAST_CACHE, _FORECAST_LOCK, key, _FORECAST_TTL) for key in keys]
+    missing = [i for i, forecast in enumerate(results) if forecast is None]
+    if not missing:
+        return [list(forecast) for forecast in results]
+
+    content = await _aio_get(FORECAST_URL, _forecast_batch_params([coords[i] for i in missing], days))
+    return _store_forecast_batch(keys, results, missing, content)
 
 
 def weather_summary(forecasts: list[DayForecast]) -> str:
     """
     Build a human/LLM-friendly summary of the forecast (e.g. for weekend days).
     """
-    lines = []
-    for d in forecasts:
-        precip = "rain/snow expected" if d.precipitation_mm > 0.5 else "dry"
-        lines.append(
-            f"{d.date}: {d.temp_min_c:.0f}–{d.temp_max_c:.0f}°C, {precip} ({d.precipitation_mm:.1f} mm)"
-        )
-    return "\n".join(lines)
+    return "\n".join(
+        f"{d.date}: {d.temp_min_c:.0f}–{d.temp_max_c:.0f}°C, "
+        f"{'rain/snow expected' if d.precipitation_mm > 0.5 else 'dry'} ({d.precipitation_mm:.1f} mm)"
+        for d in forecasts
+    )